@@ -9,29 +9,124 @@ import sys
 from pathlib import Path
 from typing import Dict, List, Set, Tuple
 import argparse
-from collections import defaultdict
+import functools
+import heapq
+import re
+from collections import Counter, defaultdict
+from itertools import repeat
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
 
-SUPPORTED_FORMATS = {
+# Interned frozenset so the per-file membership test in the scan loops hashes
+# against pre-interned suffix strings and the set itself is immutable.
+SUPPORTED_FORMATS = frozenset(sys.intern(s) for s in (
     '.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.tif',
     '.gif', '.ico', '.ppm', '.pgm', '.pbm', '.pnm', '.webp'
-}
+))
+
+# Classification dispatch table: suffix -> ScanResult attribute name, so the
+# walkers categorize with one dict lookup (missing suffixes fall through to
+# 'other_files' via .get).
+_CAT = {s: ('webp' if s == '.webp' else 'images') for s in SUPPORTED_FORMATS}
+
+# Memoized relpath: the same (path, base) pairs get normalized again whenever
+# debug_naming_mismatch re-derives expected paths after
+# check_conversion_completeness already did, and relpath re-runs abspath on
+# both arguments every call.
+_relpath = functools.lru_cache(maxsize=None)(os.path.relpath)
+
+def _relto(abs_str: str, base_prefix: str) -> str:
+    """
+    Relative path by prefix slicing: base_prefix is the base folder with a
+    trailing os.sep, precomputed once per call site. Path.relative_to walks
+    and validates both paths component by component; for paths the scanner
+    itself produced under the base, a constant-time slice is enough.
+    relpath remains the fallback for anything from elsewhere.
+    """
+    if abs_str.startswith(base_prefix):
+        return abs_str[len(base_prefix):]
+    return _relpath(abs_str, base_prefix.rstrip(os.sep))
+
+
+def _write_long_output(text: str, line_threshold: int = 1000):
+    """
+    Emit report text with one stdout write, or through a pager for large
+    interactive output.
+
+    When stdout is a tty and the text exceeds line_threshold lines, pipe it
+    into `less -R` so a million-line missing list doesn't scroll the
+    terminal for minutes; redirected output and short reports keep the
+    single plain write.
+    """
+    if sys.stdout.isatty() and text.count('\n') > line_threshold:
+        import subprocess
+        try:
+            pager = subprocess.Popen(['less', '-R'], stdin=subprocess.PIPE)
+            pager.communicate(text.encode(sys.stdout.encoding or 'utf-8', 'replace'))
+            return
+        except (OSError, BrokenPipeError):
+            pass  # no pager available (or quit early): fall through to stdout
+    sys.stdout.write(text)
+
+
+# Precompiled classifier over newline-joined file names: one finditer call
+# per directory keeps the per-name rpartition/lower/set-lookup work inside
+# the regex engine's C loop. The alternation mirrors SUPPORTED_FORMATS.
+_CLASSIFY_RE = re.compile(
+    r'(?im)^([^\n]+\.(webp|jpe?g|png|bmp|tiff?|gif|ico|p[pgbn]m))$')
+
+# Optional Rust-backed walker: scandir_rs traverses with the GIL released
+# and parallelizes inside native code, yielding os.walk-shaped tuples.
+# Purely additive — when it isn't installed the scandir loops below run.
+try:
+    from scandir_rs import Walk as _fast_walk
+except ImportError:
+    _fast_walk = None
+
+
+@dataclass
+class ScanResult:
+    """
+    Accumulator for one tree scan: category sets plus the format tally and
+    byte total fused into the same walk. Attribute access on a fixed set of
+    fields replaces the string-keyed dict lookups the hot walk loops used
+    to do per entry.
+    """
+    images: Set[str] = field(default_factory=set)
+    webp: Set[str] = field(default_factory=set)
+    other_files: Set[str] = field(default_factory=set)
+    directories: Set[str] = field(default_factory=set)
+    format_counts: Counter = field(default_factory=Counter)
+    total_bytes: int = 0
+
 
 class FolderChecker:
     """Class to check and compare folder contents."""
-    
-    def __init__(self):
-        self.supported_formats = {
-            '.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.tif', 
-            '.gif', '.ico', '.ppm', '.pgm', '.pbm', '.pnm'
-        }
-    
-    def scan_folder(self, folder_path: Path) -> Dict[str, Set[Path]]:
+
+    def __init__(self, use_fast_walk: bool = True):
+        """
+        Args:
+            use_fast_walk: Use the Rust-backed scandir_rs walker when it is
+                installed (traversal runs in native code with the GIL
+                released); False forces the pure-Python scandir walk.
+        """
+        self.use_fast_walk = use_fast_walk
+
+    def scan_folder(self, folder_path: Path, assume_exists: bool = False) -> Dict[str, Set[str]]:
         """
         Scan a folder recursively and categorize files.
-        
+
+        Paths are returned as plain strings; wrap in Path at the point of
+        use if needed. Constructing a Path per entry costs roughly a
+        microsecond each, which dwarfs the warm-cache syscall time on
+        million-file trees.
+
         Args:
             folder_path: Path to the folder to scan
-            
+            assume_exists: Skip the existence check when the caller already
+                validated the folder (saves a stat, which is expensive on
+                Windows)
+
         Returns:
             Dict with categories: 'images', 'webp', 'other_files', 'directories'
         """
@@ -41,182 +136,472 @@ class FolderChecker:
             'other_files': set(),
             'directories': set()
         }
-        
-        if not folder_path.exists():
+
+        if not assume_exists and not folder_path.exists():
             print(f"Warning: Folder {folder_path} does not exist!")
             return result
-        
-        for root, dirs, files in os.walk(folder_path):
-            root_path = Path(root)
-            
-            # Add directories
-            for dir_name in dirs:
-                result['directories'].add(root_path / dir_name)
-            
-            # Categorize files
-            for file_name in files:
-                file_path = root_path / file_name
-                suffix = file_path.suffix.lower()
-                
-                if suffix == '.webp':
-                    result['webp'].add(file_path)
-                elif suffix in self.supported_formats:
-                    result['images'].add(file_path)
+
+        # Explicit-stack scandir walk. Invariant: never call entry.stat(),
+        # Path.is_file(), or Path.exists() on an entry, and always pass
+        # follow_symlinks=False — on Windows the type flags are cached from
+        # FindFirstFileW/FindNextFileW, so keeping to DirEntry.name/path/
+        # is_dir means zero extra syscalls per entry.
+        #
+        # Classification is batched per directory: the file names are joined
+        # with newlines and run through one _CLASSIFY_RE.finditer, so the hot
+        # suffix-matching loop stays in the regex engine rather than doing a
+        # Python-level rfind+lower+set-lookup per name.
+        join = os.path.join
+        images = result['images']
+        webp = result['webp']
+        other = result['other_files']
+
+        def classify_names(current, names):
+            matched = set()
+            for m in _CLASSIFY_RE.finditer('\n'.join(names)):
+                name = m.group(1)
+                matched.add(name)
+                if m.group(2).lower() == 'webp':
+                    webp.add(join(current, name))
                 else:
-                    result['other_files'].add(file_path)
-        
+                    images.add(join(current, name))
+            if len(matched) != len(names):
+                for name in names:
+                    if name not in matched:
+                        other.add(join(current, name))
+
+        if self.use_fast_walk and _fast_walk is not None:
+            # Traversal happens in Rust; Python only consumes the per-
+            # directory name batches, which feed the same regex classifier.
+            # scandir_rs yields directory roots relative to the scan root
+            # ('' at the top level), so re-prefix them to keep the same
+            # root-prefixed paths the scandir fallback below returns.
+            root = str(folder_path)
+            for current, dirs, files in _fast_walk(root):
+                abs_current = join(root, current) if current else root
+                for dir_name in dirs:
+                    result['directories'].add(join(abs_current, dir_name))
+                if files:
+                    classify_names(abs_current, files)
+            return result
+
+        stack = [str(folder_path)]
+        while stack:
+            current = stack.pop()
+            try:
+                entries = os.scandir(current)
+            except OSError:
+                continue
+            names = []
+            with entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                        result['directories'].add(entry.path)
+                    else:
+                        names.append(entry.name)
+            if names:
+                classify_names(current, names)
+
         return result
     
-    def get_expected_webp_files(self, input_images: Set[Path], input_folder: Path, output_folder: Path) -> Set[Path]:
+    def _scan_tree(self, folder_path: Path, assume_exists: bool = False) -> ScanResult:
+        """
+        Scan a folder once, categorizing files while tallying format counts
+        and accumulating total byte size from the same pass.
+
+        Traversal is syscall-bound, so fusing categorization, format
+        detection, and size accounting into one os.scandir walk avoids
+        re-reading the tree for each statistic. entry.stat(follow_symlinks=False)
+        is called once per file and reuses metadata the directory scan
+        already fetched where the platform provides it.
+
+        The 'directories' and 'other_files' sets are filled with paths
+        already relative to folder_path (prefix-sliced as the walk emits
+        them), so the completeness check can diff them directly instead of
+        re-deriving relative paths in a second pass.
+
+        Args:
+            folder_path: Path to the folder to scan
+
+        Returns:
+            ScanResult with the category sets, 'format_counts' Counter and
+            'total_bytes' running total filled in
+        """
+        result = self._new_scan_result()
+        plen = len(str(folder_path).rstrip(os.sep) + os.sep)
+
+        if not assume_exists and not folder_path.exists():
+            print(f"Warning: Folder {folder_path} does not exist!")
+            return result
+
+        # Classify the root level directly and collect its subdirectories so
+        # deep trees can be fanned out across workers.
+        subdirs = []
+        try:
+            entries = os.scandir(folder_path)
+        except OSError:
+            entries = None
+        if entries is not None:
+            with entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                        result.directories.add(entry.path[plen:])
+                        continue
+                    name = entry.name
+                    dot = name.rfind('.')
+                    suffix = name[dot:].lower() if dot >= 0 else ''
+                    try:
+                        result.total_bytes += entry.stat(follow_symlinks=False).st_size
+                    except OSError:
+                        pass
+                    self._classify(entry.path, suffix, result, plen)
+
+        # Fan out only when the tree branches enough at the top level for the
+        # thread overhead to pay off; each worker fills its own result dict so
+        # no mutable state is shared mid-scan.
+        if len(subdirs) > 4:
+            max_workers = min(len(subdirs), os.cpu_count() or 1)
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                for partial in executor.map(self._scan_subtree, subdirs, repeat(plen)):
+                    self._merge_scan(result, partial)
+        else:
+            for subdir in subdirs:
+                self._merge_scan(result, self._scan_subtree(subdir, plen))
+
+        # Tally format counts in one C-level Counter.update over the
+        # categorized image paths instead of a per-file dict increment
+        # inside the walk loop.
+        result.format_counts.update(
+            os.path.splitext(p)[1].lower() for p in result.images)
+        if result.webp:
+            result.format_counts['.webp'] = len(result.webp)
+
+        return result
+
+    @staticmethod
+    def _new_scan_result() -> ScanResult:
+        """Empty result accumulator shared by _scan_tree and its subtree workers."""
+        return ScanResult()
+
+    def _scan_subtree(self, root: str, plen: int) -> ScanResult:
+        """Walk one subtree into a fresh result dict (thread-worker unit)."""
+        partial = self._new_scan_result()
+        if hasattr(os, 'fwalk'):
+            self._scan_tree_fwalk(root, partial, plen)
+        else:
+            self._scan_tree_scandir(root, partial, plen)
+        return partial
+
+    @staticmethod
+    def _is_empty_dir(folder) -> bool:
+        """True if the directory has no entries at all (one scandir probe)."""
+        try:
+            with os.scandir(folder) as it:
+                return next(it, None) is None
+        except OSError:
+            return True
+
+    @staticmethod
+    def _merge_scan(result: ScanResult, partial: ScanResult):
+        """Merge a subtree worker's result into the aggregate."""
+        result.images.update(partial.images)
+        result.webp.update(partial.webp)
+        result.other_files.update(partial.other_files)
+        result.directories.update(partial.directories)
+        result.total_bytes += partial.total_bytes
+
+    def _scan_tree_fwalk(self, root: str, result: ScanResult, plen: int):
+        """
+        POSIX _scan_tree walker built on os.fwalk.
+
+        fwalk keeps an open FD per directory, so the per-file stat goes
+        through dir_fd and the kernel skips re-resolving the directory chain
+        for every entry.
+        """
+        for dirpath, dirnames, filenames, dirfd in os.fwalk(root, follow_symlinks=False):
+            rel_dir = dirpath[plen:]
+            for dir_name in dirnames:
+                result.directories.add(os.path.join(rel_dir, dir_name))
+            for name in filenames:
+                dot = name.rfind('.')
+                suffix = name[dot:].lower() if dot >= 0 else ''
+                try:
+                    st = os.stat(name, dir_fd=dirfd, follow_symlinks=False)
+                    result.total_bytes += st.st_size
+                except OSError:
+                    pass
+                self._classify(os.path.join(dirpath, name), suffix, result, plen)
+
+    def _scan_tree_scandir(self, root: str, result: ScanResult, plen: int):
+        """
+        Fallback _scan_tree walker for platforms without os.fwalk (Windows),
+        where the DirEntry already carries the stat data from the directory
+        enumeration.
+        """
+        stack = [root]
+        while stack:
+            current = stack.pop()
+            try:
+                entries = os.scandir(current)
+            except OSError:
+                continue
+            with entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                        result.directories.add(entry.path[plen:])
+                        continue
+                    name = entry.name
+                    dot = name.rfind('.')
+                    suffix = name[dot:].lower() if dot >= 0 else ''
+                    try:
+                        result.total_bytes += entry.stat(follow_symlinks=False).st_size
+                    except OSError:
+                        pass
+                    self._classify(entry.path, suffix, result, plen)
+
+    def _classify(self, path: str, suffix: str, result: ScanResult, plen: int):
+        """
+        Place a scanned file into the right category set.
+
+        One _CAT lookup picks the target attribute, replacing the former
+        equality check plus frozenset membership test per file. Images and
+        webp keep the absolute path (the expected mapping and diffs work on
+        those); other files are stored relative so the missing-files check
+        can diff the sets directly.
+        """
+        cat = _CAT.get(suffix)
+        if cat is None:
+            result.other_files.add(path[plen:])
+        else:
+            getattr(result, cat).add(path)
+
+    def get_expected_webp_files(self, input_images: Set[str], input_folder: Path, output_folder: Path) -> Tuple[Set[str], Dict[str, str]]:
         """
         Generate expected WebP file paths based on input images and naming convention.
         The converter uses a smart naming system to handle duplicates, so we need to be flexible.
-        
+
         Args:
             input_images: Set of input image paths
             input_folder: Input folder path
             output_folder: Output folder path
-            
+
         Returns:
-            Set of expected WebP file paths
+            Tuple of (expected WebP file paths, mapping of input image -> expected WebP path)
         """
-        expected_webp = set()
-        
-        # Group images by their stem (filename without extension) to handle duplicates
-        stem_groups = {}
+        input_to_expected = self._expected_mapping(input_images, input_folder, output_folder)
+        return set(input_to_expected.values()), input_to_expected
+
+    def _expected_mapping(self, input_images: Set[str], input_folder: Path, output_folder: Path) -> Dict[str, str]:
+        """
+        Build the input image -> expected WebP path mapping without
+        materializing a separate expected set; the completeness check streams
+        over the mapping values instead, which keeps peak memory at one
+        expected entry per image rather than two.
+        """
+        input_to_expected = {}
+        output_str = str(output_folder)
+        # Every scanned image lives under input_folder, so _relto resolves
+        # each relative path with a prefix slice (relpath only as fallback
+        # for callers that pass paths from elsewhere).
+        input_prefix = str(input_folder).rstrip(os.sep) + os.sep
+
+        # Build structure-of-arrays records (rel_parent, stem, ext) once per
+        # image with os.path calls, so the grouping and emission loops below
+        # never re-parse a Path. pathlib properties parse the whole string on
+        # every access, which dominates on large trees.
+        # Two passes with a Counter instead of per-stem list buckets: stems
+        # are almost always unique, so grouping paid a list allocation per
+        # stem just to learn each group had one member. The flat records
+        # list is one allocation total.
+        stem_counts = Counter()
+        records = []
         for img_path in input_images:
-            rel_path = img_path.relative_to(input_folder)
-            stem = rel_path.stem
-            if stem not in stem_groups:
-                stem_groups[stem] = []
-            stem_groups[stem].append(rel_path)
-        
-        for stem, image_paths in stem_groups.items():
-            if len(image_paths) == 1:
+            rel_parent, name = os.path.split(_relto(img_path, input_prefix))
+            # The split produces a fresh rel_parent string per image even
+            # though every image in a directory shares the same one;
+            # interning collapses them to a single object per directory, so
+            # the records and the joins below reuse its cached hash.
+            rel_parent = sys.intern(rel_parent)
+            stem, ext = os.path.splitext(name)
+            stem_counts[stem] += 1
+            records.append((img_path, rel_parent, stem, ext[1:]))
+
+        join = os.path.join
+        for img_path, rel_parent, stem, ext in records:
+            if stem_counts[stem] == 1:
                 # Single image with this name - expect simple .webp
-                rel_path = image_paths[0]
-                expected_webp_path = output_folder / rel_path.parent / f"{stem}.webp"
-                expected_webp.add(expected_webp_path)
+                input_to_expected[img_path] = join(output_str, rel_parent, f"{stem}.webp")
             else:
                 # Multiple images with same name but different formats
                 # The converter will create: stem.webp, stem_jpg.webp, stem_png.webp, etc.
-                for rel_path in image_paths:
-                    format_suffix = f"{stem}_{rel_path.suffix[1:]}.webp"
-                    expected_webp_path = output_folder / rel_path.parent / format_suffix
-                    expected_webp.add(expected_webp_path)
-        
-        return expected_webp
+                input_to_expected[img_path] = join(output_str, rel_parent, f"{stem}_{ext}.webp")
+
+        return input_to_expected
     
-    def debug_naming_mismatch(self, input_images: Set[Path], output_webp: Set[Path], input_folder: Path, output_folder: Path):
+    def debug_naming_mismatch(self, expected_webp: Set[str], output_webp: Set[str]):
         """
         Debug method to show the naming mismatch between expected and actual files.
+
+        Takes the expected set check_conversion_completeness already derived
+        (e.g. set(results['input_to_expected'].values())) instead of
+        re-running the stem grouping over every input image.
         """
-        print(f"\n🔍 DEBUGGING NAMING MISMATCH:")
-        print(f"Input images: {len(input_images)}")
-        print(f"Output WebP files: {len(output_webp)}")
-        
-        # Get expected files
-        expected_webp = self.get_expected_webp_files(input_images, input_folder, output_folder)
-        print(f"Expected WebP files: {len(expected_webp)}")
-        
+        # Buffered like print_report: build the lines and emit one write
+        # instead of a lock-and-flush print per line.
+        out = []
+        out.append(f"\n🔍 DEBUGGING NAMING MISMATCH:\n")
+        out.append(f"Output WebP files: {len(output_webp)}\n")
+        out.append(f"Expected WebP files: {len(expected_webp)}\n")
+
         # Show some examples of expected vs actual
-        print(f"\n📋 SAMPLE COMPARISON (first 10 files):")
-        print("-" * 60)
-        
-        expected_list = sorted(expected_webp)
-        actual_list = sorted(output_webp)
-        
-        print("EXPECTED FILES:")
-        for i, expected in enumerate(expected_list[:10]):
+        out.append(f"\n📋 SAMPLE COMPARISON (first 10 files):\n")
+        out.append("-" * 60 + "\n")
+
+        # Only the first 10 of each list are shown, so an O(n log 10)
+        # nsmallest beats fully sorting potentially millions of paths.
+        out.append("EXPECTED FILES:\n")
+        for expected in heapq.nsmallest(10, expected_webp):
             exists = "✅" if expected in output_webp else "❌"
-            print(f"  {exists} {expected}")
-        
-        print(f"\nACTUAL FILES:")
-        for i, actual in enumerate(actual_list[:10]):
+            out.append(f"  {exists} {expected}\n")
+
+        out.append(f"\nACTUAL FILES:\n")
+        for actual in heapq.nsmallest(10, output_webp):
             expected = "✅" if actual in expected_webp else "❌"
-            print(f"  {expected} {actual}")
-        
+            out.append(f"  {expected} {actual}\n")
+
         # Show missing files
         missing = expected_webp - output_webp
         if missing:
-            print(f"\n❌ MISSING FILES (first 10):")
-            for missing_file in sorted(missing)[:10]:
-                print(f"  {missing_file}")
-        
+            out.append(f"\n❌ MISSING FILES (first 10):\n")
+            for missing_file in heapq.nsmallest(10, missing):
+                out.append(f"  {missing_file}\n")
+
         # Show unexpected files
         unexpected = output_webp - expected_webp
         if unexpected:
-            print(f"\n⚠️  UNEXPECTED FILES (first 10):")
-            for unexpected_file in sorted(unexpected)[:10]:
-                print(f"  {unexpected_file}")
-        
-        print("-" * 60)
+            out.append(f"\n⚠️  UNEXPECTED FILES (first 10):\n")
+            for unexpected_file in heapq.nsmallest(10, unexpected):
+                out.append(f"  {unexpected_file}\n")
+
+        out.append("-" * 60 + "\n")
+        sys.stdout.write("".join(out))
     
-    def check_conversion_completeness(self, input_folder: Path, output_folder: Path) -> Dict:
+    def check_conversion_completeness(self, input_folder: Path, output_folder: Path,
+                                      collect_detail: bool = True) -> Dict:
         """
         Check if all images from input folder have been converted to WebP in output folder.
-        
+
         Args:
             input_folder: Input folder path
             output_folder: Output folder path
-            
+            collect_detail: Include the full 'input_images' and 'output_webp'
+                sets in the results (needed by debug_naming_mismatch). When
+                False those keys hold empty sets, so the scanned paths can be
+                freed as soon as the diffs are computed instead of being
+                retained for the caller's lifetime.
+
         Returns:
             Dict with check results and statistics
         """
         print(f"Scanning input folder: {input_folder}")
-        input_contents = self.scan_folder(input_folder)
-        
         print(f"Scanning output folder: {output_folder}")
-        output_contents = self.scan_folder(output_folder)
+        # Validate each folder with one stat up front so the scans can skip
+        # their own existence probes.
+        def _folder_ok(folder):
+            try:
+                os.stat(folder)
+                return True
+            except OSError:
+                print(f"Warning: Folder {folder} does not exist!")
+                return False
+
+        input_ok = _folder_ok(input_folder)
+        output_ok = _folder_ok(output_folder)
+
+        # Common case when the conversion has not run yet: the output root
+        # exists but is empty. One scandir probe settles that, so the whole
+        # output walk can be skipped and every expected file is missing.
+        # (st_nlink == 2 would say the same on classic POSIX filesystems,
+        # but e.g. btrfs keeps directory nlink at 1, so the probe is the
+        # portable single-syscall check.)
+        scan_output = output_ok and not self._is_empty_dir(output_folder)
+
+        # The two scans are independent and mostly blocked on readdir/stat,
+        # which release the GIL, so running them on two threads overlaps the
+        # kernel I/O of both trees.
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            input_future = executor.submit(self._scan_tree, input_folder, True) if input_ok else None
+            output_future = executor.submit(self._scan_tree, output_folder, True) if scan_output else None
+            input_contents = input_future.result() if input_future else self._new_scan_result()
+            output_contents = output_future.result() if output_future else self._new_scan_result()
         
         # Filter out WebP files from input images - they shouldn't be converted
-        convertible_images = {img for img in input_contents['images'] 
-                            if img.suffix.lower() != '.webp'}
+        convertible_images = {img for img in input_contents.images
+                              if not img.lower().endswith('.webp')}
         
-        print(f"Found {len(input_contents['images'])} total images in input")
-        print(f"Found {len(input_contents['webp'])} WebP files in input (will be skipped)")
+        print(f"Found {len(input_contents.images)} total images in input")
+        print(f"Found {len(input_contents.webp)} WebP files in input (will be skipped)")
         print(f"Found {len(convertible_images)} convertible images in input")
         
-        # Get expected WebP files (only for convertible images)
-        expected_webp = self.get_expected_webp_files(
+        # Get expected WebP paths (only for convertible images) and stream
+        # the comparison over the mapping values: missing and seen_expected
+        # are built in one pass, so no standalone expected set is ever held
+        # alongside the output set.
+        input_to_expected = self._expected_mapping(
             convertible_images, input_folder, output_folder
         )
-        
-        # Find missing WebP files
-        missing_webp = expected_webp - output_contents['webp']
-        
+
+        output_webp_set = output_contents.webp
+        missing_webp = set()
+        seen_expected = set()
+        for expected in input_to_expected.values():
+            if expected not in output_webp_set:
+                missing_webp.add(expected)
+            seen_expected.add(expected)
+
         # Find unexpected WebP files (not from our conversion)
-        unexpected_webp = output_contents['webp'] - expected_webp
-        
-        # Check for missing directories
-        input_dirs = {d.relative_to(input_folder) for d in input_contents['directories']}
-        output_dirs = {d.relative_to(output_folder) for d in output_contents['directories']}
-        missing_dirs = input_dirs - output_dirs
+        unexpected_webp = output_webp_set - seen_expected
         
-        # Check for missing other files
-        input_other = {f.relative_to(input_folder) for f in input_contents['other_files']}
-        output_other = {f.relative_to(output_folder) for f in output_contents['other_files']}
-        missing_other = input_other - output_other
+        # The scans already emitted directories and other files relative to
+        # their roots, so the missing checks are direct set differences with
+        # no relative-path pass here.
+        missing_dirs = input_contents.directories - output_contents.directories
+        missing_other = input_contents.other_files - output_contents.other_files
         
         return {
             'input_stats': {
-                'total_images': len(input_contents['images']),
-                'total_webp': len(input_contents['webp']),
+                'total_images': len(input_contents.images),
+                'total_webp': len(input_contents.webp),
                 'convertible_images': len(convertible_images),
-                'total_other_files': len(input_contents['other_files']),
-                'total_directories': len(input_contents['directories'])
+                'total_other_files': len(input_contents.other_files),
+                'total_directories': len(input_contents.directories),
+                'format_counts': input_contents.format_counts,
+                'total_bytes': input_contents.total_bytes
             },
             'output_stats': {
-                'total_webp': len(output_contents['webp']),
-                'total_other_files': len(output_contents['other_files']),
-                'total_directories': len(output_contents['directories'])
+                'total_webp': len(output_contents.webp),
+                'total_other_files': len(output_contents.other_files),
+                'total_directories': len(output_contents.directories),
+                'format_counts': output_contents.format_counts,
+                'total_bytes': output_contents.total_bytes
             },
             'missing_webp': missing_webp,
             'unexpected_webp': unexpected_webp,
+            'input_to_expected': input_to_expected,
+            # Pre-sorted variants so the report/list writers don't each re-sort
+            # the same sets. The items are plain strings, so Timsort compares
+            # them with C-level memcmp-style comparison and needs no key.
+            'missing_webp_sorted': sorted(missing_webp),
+            'unexpected_webp_sorted': sorted(unexpected_webp),
+            'missing_directories_sorted': sorted(missing_dirs),
+            'missing_other_files_sorted': sorted(missing_other),
             'missing_directories': missing_dirs,
             'missing_other_files': missing_other,
-            'input_images': convertible_images,  # Use only convertible images
-            'output_webp': output_contents['webp']
+            'input_images': convertible_images if collect_detail else set(),  # Use only convertible images
+            'output_webp': output_webp_set if collect_detail else set()
         }
     
     def print_report(self, results: Dict, input_folder: Path, output_folder: Path):
@@ -228,68 +613,74 @@ class FolderChecker:
             input_folder: Input folder path
             output_folder: Output folder path
         """
-        print("\n" + "="*60)
-        print("FOLDER COMPARISON REPORT")
-        print("="*60)
-        
+        # Buffer the whole report and emit it with a single write; per-line
+        # print() calls each take the stdout lock and flush, which adds up
+        # when the missing/unexpected lists are large.
+        out = []
+
+        out.append("\n" + "="*60 + "\n")
+        out.append("FOLDER COMPARISON REPORT\n")
+        out.append("="*60 + "\n")
+
         # Input folder statistics
-        print(f"\n📁 INPUT FOLDER: {input_folder}")
-        print(f"   Total images: {results['input_stats']['total_images']}")
-        print(f"   WebP files (skipped): {results['input_stats']['total_webp']}")
-        print(f"   Convertible images: {results['input_stats']['convertible_images']}")
-        print(f"   Other files: {results['input_stats']['total_other_files']}")
-        print(f"   Directories: {results['input_stats']['total_directories']}")
-        
+        out.append(f"\n📁 INPUT FOLDER: {input_folder}\n")
+        out.append(f"   Total images: {results['input_stats']['total_images']}\n")
+        out.append(f"   WebP files (skipped): {results['input_stats']['total_webp']}\n")
+        out.append(f"   Convertible images: {results['input_stats']['convertible_images']}\n")
+        out.append(f"   Other files: {results['input_stats']['total_other_files']}\n")
+        out.append(f"   Directories: {results['input_stats']['total_directories']}\n")
+
         # Output folder statistics
-        print(f"\n📁 OUTPUT FOLDER: {output_folder}")
-        print(f"   WebP files: {results['output_stats']['total_webp']}")
-        print(f"   Other files: {results['output_stats']['total_other_files']}")
-        print(f"   Directories: {results['output_stats']['total_directories']}")
-        
+        out.append(f"\n📁 OUTPUT FOLDER: {output_folder}\n")
+        out.append(f"   WebP files: {results['output_stats']['total_webp']}\n")
+        out.append(f"   Other files: {results['output_stats']['total_other_files']}\n")
+        out.append(f"   Directories: {results['output_stats']['total_directories']}\n")
+
         # Missing WebP files
         if results['missing_webp']:
-            print(f"\n❌ MISSING WEBP FILES ({len(results['missing_webp'])}):")
-            for missing in sorted(results['missing_webp']):
-                print(f"   {missing}")
+            out.append(f"\n❌ MISSING WEBP FILES ({len(results['missing_webp'])}):\n")
+            for missing in results['missing_webp_sorted']:
+                out.append(f"   {missing}\n")
         else:
-            print(f"\n✅ ALL IMAGES CONVERTED TO WEBP!")
-        
+            out.append(f"\n✅ ALL IMAGES CONVERTED TO WEBP!\n")
+
         # Unexpected WebP files
         if results['unexpected_webp']:
-            print(f"\n⚠️  UNEXPECTED WEBP FILES ({len(results['unexpected_webp'])}):")
-            for unexpected in sorted(results['unexpected_webp']):
-                print(f"   {unexpected}")
-        
+            out.append(f"\n⚠️  UNEXPECTED WEBP FILES ({len(results['unexpected_webp'])}):\n")
+            for unexpected in results['unexpected_webp_sorted']:
+                out.append(f"   {unexpected}\n")
+
         # Missing directories
         if results['missing_directories']:
-            print(f"\n❌ MISSING DIRECTORIES ({len(results['missing_directories'])}):")
-            for missing_dir in sorted(results['missing_directories']):
-                print(f"   {missing_dir}")
-        
+            out.append(f"\n❌ MISSING DIRECTORIES ({len(results['missing_directories'])}):\n")
+            for missing_dir in results['missing_directories_sorted']:
+                out.append(f"   {missing_dir}\n")
+
         # Missing other files
         if results['missing_other_files']:
-            print(f"\n❌ MISSING OTHER FILES ({len(results['missing_other_files'])}):")
-            for missing_file in sorted(results['missing_other_files']):
-                print(f"   {missing_file}")
-        
+            out.append(f"\n❌ MISSING OTHER FILES ({len(results['missing_other_files'])}):\n")
+            for missing_file in results['missing_other_files_sorted']:
+                out.append(f"   {missing_file}\n")
+
         # Summary
-        print(f"\n📊 SUMMARY:")
+        out.append(f"\n📊 SUMMARY:\n")
         total_convertible_images = results['input_stats']['convertible_images']
         total_output_webp = results['output_stats']['total_webp']
         missing_count = len(results['missing_webp'])
-        
+
         if total_convertible_images > 0:
             conversion_rate = ((total_convertible_images - missing_count) / total_convertible_images) * 100
-            print(f"   Conversion rate: {conversion_rate:.1f}%")
-            print(f"   Successfully converted: {total_convertible_images - missing_count}/{total_convertible_images}")
-        
+            out.append(f"   Conversion rate: {conversion_rate:.1f}%\n")
+            out.append(f"   Successfully converted: {total_convertible_images - missing_count}/{total_convertible_images}\n")
+
         if missing_count > 0:
-            print(f"   Missing conversions: {missing_count}")
-            print(f"   Status: ❌ INCOMPLETE")
+            out.append(f"   Missing conversions: {missing_count}\n")
+            out.append(f"   Status: ❌ INCOMPLETE\n")
         else:
-            print(f"   Status: ✅ COMPLETE")
-        
-        print("="*60)
+            out.append(f"   Status: ✅ COMPLETE\n")
+
+        out.append("="*60 + "\n")
+        _write_long_output("".join(out))
     
     def generate_missing_list(self, results: Dict, output_file: str = "missing_files.txt"):
         """
@@ -299,89 +690,245 @@ class FolderChecker:
             results: Results from check_conversion_completeness
             output_file: Output file name
         """
-        with open(output_file, 'w') as f:
+        # One joined write per section (with a large output buffer) instead of
+        # a Python-level f.write per missing entry; the pre-sorted lists mean
+        # empty sections cost nothing.
+        with open(output_file, 'w', buffering=1 << 20) as f:
             f.write("MISSING FILES REPORT\n")
             f.write("="*50 + "\n\n")
-            
-            if results['missing_webp']:
+
+            if results['missing_webp_sorted']:
                 f.write("MISSING WEBP FILES:\n")
                 f.write("-" * 20 + "\n")
-                for missing in sorted(results['missing_webp']):
-                    f.write(f"{missing}\n")
-                f.write("\n")
-            
-            if results['missing_directories']:
+                f.write("\n".join(results['missing_webp_sorted']))
+                f.write("\n\n")
+
+            if results['missing_directories_sorted']:
                 f.write("MISSING DIRECTORIES:\n")
                 f.write("-" * 20 + "\n")
-                for missing_dir in sorted(results['missing_directories']):
-                    f.write(f"{missing_dir}\n")
-                f.write("\n")
-            
-            if results['missing_other_files']:
+                f.write("\n".join(results['missing_directories_sorted']))
+                f.write("\n\n")
+
+            if results['missing_other_files_sorted']:
                 f.write("MISSING OTHER FILES:\n")
                 f.write("-" * 20 + "\n")
-                for missing_file in sorted(results['missing_other_files']):
-                    f.write(f"{missing_file}\n")
+                f.write("\n".join(results['missing_other_files_sorted']))
+                f.write("\n")
         
         print(f"\n📄 Missing files list saved to: {output_file}")
 
 
-def get_all_files(folder: Path) -> Set[Path]:
+def get_all_files(folder: Path) -> Tuple[Set[str], int]:
     """
-    Recursively get all files in a folder, returning their relative paths.
+    Recursively get all files in a folder, returning their relative path
+    strings and the total size in bytes accumulated during the same walk.
+
+    Walks with os.scandir like the other helpers: the is-dir check comes
+    from the directory entry, the size from one stat per file, and the
+    relative path from a prefix slice instead of Path.relative_to.
     """
     all_files = set()
-    for root, dirs, files in os.walk(folder):
-        root_path = Path(root)
-        for file in files:
-            rel_path = (root_path / file).relative_to(folder)
-            all_files.add(rel_path)
-    return all_files
+    total_size = 0
+    prefix_len = len(str(folder).rstrip(os.sep) + os.sep)
+    stack = [str(folder)]
+    while stack:
+        current = stack.pop()
+        try:
+            entries = os.scandir(current)
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                    continue
+                try:
+                    total_size += entry.stat(follow_symlinks=False).st_size
+                except OSError:
+                    pass
+                # entry.path is rooted at folder, so the relative part is a
+                # constant-width slice
+                all_files.add(entry.path[prefix_len:])
+    return all_files, total_size
 
 
-def predict_output_filenames(input_path: Path) -> Set[Path]:
+def predict_output_filenames(input_path: Path) -> Tuple[Set[str], int]:
     """
     Predict output filenames for all supported images in the input folder,
     using the converter's unique naming logic for duplicates.
-    Returns a set of relative output paths.
+    Returns a set of relative output path strings and the input folder's
+    total size in bytes, accumulated during the same walk.
+
+    The routine is specialized to the fixed input_path: each relative path
+    is a constant-width slice of entry.path and the parent/stem split comes
+    from rpartition on that string, so the walk and the grouping allocate
+    no Path objects at all.
     """
-    # Group images by (relative parent, stem)
-    groups: Dict[(Path, str), List[Path]] = defaultdict(list)
-    for root, dirs, files in os.walk(input_path):
-        root_path = Path(root)
-        for file in files:
-            file_path = root_path / file
-            suffix = file_path.suffix.lower()
-            if suffix in SUPPORTED_FORMATS and suffix != '.webp':
-                rel_path = file_path.relative_to(input_path)
-                groups[(rel_path.parent, rel_path.stem)].append(rel_path)
-    
+    # Count (relative parent, stem) occurrences; records stay in one flat
+    # list so the near-universal unique-stem case allocates no group lists
+    stem_counts: Counter = Counter()
+    records: List[Tuple[str, str, str]] = []
+    total_size = 0
+    supported = SUPPORTED_FORMATS  # local alias: LOAD_FAST in the loop
+    prefix_len = len(str(input_path).rstrip(os.sep) + os.sep)
+    stack = [str(input_path)]
+    while stack:
+        current = stack.pop()
+        try:
+            entries = os.scandir(current)
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                    continue
+                try:
+                    total_size += entry.stat(follow_symlinks=False).st_size
+                except OSError:
+                    pass
+                name = entry.name
+                dot = name.rfind('.')
+                suffix = name[dot:].lower() if dot >= 0 else ''
+                if suffix in supported and suffix != '.webp':
+                    rel_parent = entry.path[prefix_len:].rpartition(os.sep)[0]
+                    stem = name[:dot]
+                    stem_counts[(rel_parent, stem)] += 1
+                    records.append((rel_parent, stem, suffix))
+
     predicted = set()
-    for (parent, stem), rel_paths in groups.items():
-        if len(rel_paths) == 1:
+    join = os.path.join
+    for parent, stem, suffix in records:
+        if stem_counts[(parent, stem)] == 1:
             # Only one file with this stem: output is stem.webp
-            predicted.add(parent / f"{stem}.webp")
+            predicted.add(join(parent, f"{stem}.webp"))
         else:
             # Multiple files with same stem: use suffix in name
-            for rel_path in rel_paths:
-                ext = rel_path.suffix.lower()[1:]  # without dot
-                predicted.add(parent / f"{stem}_{ext}.webp")
-    return predicted
+            predicted.add(join(parent, f"{stem}_{suffix[1:]}.webp"))
+    return predicted, total_size
+
+
+def _subtree_size(root: str) -> int:
+    """Total file bytes under one subtree (worker unit for get_folder_size)."""
+    total_size = 0
+    stack = [root]
+    while stack:
+        current = stack.pop()
+        try:
+            entries = os.scandir(current)
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    try:
+                        total_size += entry.stat(follow_symlinks=False).st_size
+                    except OSError:
+                        pass
+    return total_size
 
 
 def get_folder_size(folder: Path) -> int:
     """
     Recursively calculate the total size of all files in a folder (in bytes).
+
+    Uses os.scandir so the is-file check comes from the directory entry and
+    the size needs a single stat per file. Like _scan_tree, the top-level
+    subdirectories are summed across threads when the tree branches enough
+    — the work is stat-bound and stat releases the GIL, so threads overlap
+    the syscalls without the pickling a process pool would add for the
+    partial sums.
     """
     total_size = 0
-    for root, dirs, files in os.walk(folder):
-        for file in files:
-            fp = Path(root) / file
-            if fp.is_file():
-                total_size += fp.stat().st_size
+    subdirs = []
+    try:
+        entries = os.scandir(folder)
+    except OSError:
+        return 0
+    with entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append(entry.path)
+            elif entry.is_file(follow_symlinks=False):
+                try:
+                    total_size += entry.stat(follow_symlinks=False).st_size
+                except OSError:
+                    pass
+    if len(subdirs) > 4:
+        max_workers = min(len(subdirs), os.cpu_count() or 1)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            total_size += sum(executor.map(_subtree_size, subdirs))
+    else:
+        for subdir in subdirs:
+            total_size += _subtree_size(subdir)
     return total_size
 
 
+_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'webp_checker')
+
+
+def _collect_dir_mtimes(folder: Path) -> Dict[str, int]:
+    """
+    Map every directory under folder (inclusive) to its mtime in ns.
+
+    This is the cache-validation pass: it reads directory entries but never
+    stats files, so on a tree with millions of files it costs one stat per
+    directory instead of one per file.
+    """
+    mtimes = {}
+    stack = [str(folder)]
+    while stack:
+        current = stack.pop()
+        try:
+            mtimes[current] = os.stat(current).st_mtime_ns
+            entries = os.scandir(current)
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+    return mtimes
+
+
+def _run_cached(tag: str, folder: Path, func):
+    """
+    Return func(folder), reusing a pickled result from a previous run when
+    no directory under folder has changed since.
+
+    Validity is keyed on the mtimes of every directory in the tree, which
+    catches files being added, removed, or renamed. An in-place rewrite of
+    an existing file leaves its parent directory's mtime untouched, so size
+    totals can lag until the tree structure changes; the cache is therefore
+    opt-in via --cache.
+    """
+    import hashlib
+    import pickle
+
+    mtimes = _collect_dir_mtimes(folder)
+    key = hashlib.sha1(f"{tag}:{os.path.abspath(folder)}".encode()).hexdigest()
+    cache_file = os.path.join(_CACHE_DIR, f"{key}.pkl")
+
+    try:
+        with open(cache_file, 'rb') as f:
+            cached = pickle.load(f)
+        if cached['dir_mtimes'] == mtimes:
+            return cached['result']
+    except (OSError, KeyError, EOFError, pickle.PickleError):
+        pass
+
+    result = func(folder)
+    try:
+        os.makedirs(_CACHE_DIR, exist_ok=True)
+        with open(cache_file, 'wb') as f:
+            pickle.dump({'dir_mtimes': mtimes, 'result': result}, f)
+    except OSError:
+        pass  # cache is best-effort; never fail the check over it
+    return result
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Check that all input images are present in output, considering unique renaming.",
@@ -393,23 +940,63 @@ Examples:
     )
     parser.add_argument('input_folder', help='Input folder path')
     parser.add_argument('output_folder', help='Output folder path')
+    parser.add_argument('--profile', action='store_true',
+                        help='Run the check under cProfile and print the hottest functions')
+    parser.add_argument('--cache', action='store_true',
+                        help='Reuse scan results from a previous run when the '
+                             'directory tree is unchanged (validated by directory mtimes)')
     args = parser.parse_args()
 
     input_path = Path(args.input_folder)
     output_path = Path(args.output_folder)
 
-    if not input_path.exists():
+    # One stat per folder via os.stat; Path.exists would issue the same
+    # syscall but the walks below no longer re-validate.
+    try:
+        os.stat(input_path)
+    except OSError:
         print(f"Error: Input folder '{input_path}' does not exist!")
         sys.exit(1)
-    if not output_path.exists():
+    try:
+        os.stat(output_path)
+    except OSError:
         print(f"Error: Output folder '{output_path}' does not exist!")
         sys.exit(1)
 
-    predicted_output_files = predict_output_filenames(input_path)
-    actual_output_files = get_all_files(output_path)
+    # Optional profiling so tuning decisions can be based on whether a given
+    # tree is syscall-bound (walk functions dominate) or CPU-bound on Python
+    # object churn (set/str functions dominate).
+    profiler = None
+    if args.profile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    # Sizes come back from the same walks, so no second traversal is needed
+    # for the compression summary below.
+    # The two walks are independent and blocked on readdir/stat, which
+    # release the GIL, so running them on two threads overlaps the kernel
+    # I/O of both trees (same pattern as check_conversion_completeness).
+    if args.cache:
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            predict_future = executor.submit(
+                _run_cached, 'predict', input_path, predict_output_filenames)
+            all_files_future = executor.submit(
+                _run_cached, 'all_files', output_path, get_all_files)
+            predicted_output_files, input_size = predict_future.result()
+            actual_output_files, output_size = all_files_future.result()
+    else:
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            predict_future = executor.submit(predict_output_filenames, input_path)
+            all_files_future = executor.submit(get_all_files, output_path)
+            predicted_output_files, input_size = predict_future.result()
+            actual_output_files, output_size = all_files_future.result()
 
     missing_in_output = predicted_output_files - actual_output_files
 
+    if profiler is not None:
+        profiler.disable()
+
     print("\n==============================")
     print("FOLDER MIRROR CHECK (with unique renaming)")
     print("==============================")
@@ -425,9 +1012,6 @@ Examples:
     else:
         print("\n✅ All predicted output files are present!")
 
-    input_size = get_folder_size(input_path)
-    output_size = get_folder_size(output_path)
-
     print(f"\nTotal size of input:  {input_size / (1024*1024):.2f} MB ({input_size} bytes)")
     print(f"Total size of output: {output_size / (1024*1024):.2f} MB ({output_size} bytes)")
     if input_size > 0:
@@ -439,6 +1023,10 @@ Examples:
 
     print("==============================")
 
+    if profiler is not None:
+        import pstats
+        pstats.Stats(profiler).sort_stats('cumulative').print_stats(30)
+
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -6,23 +6,41 @@ Creates test images and converts them to various formats to verify functionality
 
 import os
 import tempfile
-import shutil
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from pathlib import Path
 from PIL import Image, ImageDraw, ImageFont
 from webp_converter import WebPConverter
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 def create_test_image(filename, size=(400, 300), format_type='PNG'):
     """Create a test image for conversion."""
-    # Create a new image with a gradient background
-    img = Image.new('RGB', size, color='white')
-    draw = ImageDraw.Draw(img)
-    
-    # Draw a simple pattern
-    for i in range(0, size[0], 20):
-        for j in range(0, size[1], 20):
-            color = (i % 255, j % 255, (i + j) % 255)
-            draw.rectangle([i, j, i + 19, j + 19], fill=color)
-    
+    if np is not None:
+        # Vectorized block pattern: three array ops replace the ~300
+        # draw.rectangle calls of the fallback below.
+        yi, xi = np.mgrid[0:size[1], 0:size[0]]
+        block_x = (xi // 20) * 20
+        block_y = (yi // 20) * 20
+        rgb = np.stack(
+            [block_x % 255, block_y % 255, (block_x + block_y) % 255],
+            axis=-1).astype(np.uint8)
+        img = Image.fromarray(rgb)
+        draw = ImageDraw.Draw(img)
+    else:
+        # Create a new image with a gradient background
+        img = Image.new('RGB', size, color='white')
+        draw = ImageDraw.Draw(img)
+
+        # Draw a simple pattern
+        for i in range(0, size[0], 20):
+            for j in range(0, size[1], 20):
+                color = (i % 255, j % 255, (i + j) % 255)
+                draw.rectangle([i, j, i + 19, j + 19], fill=color)
+
     # Add some text
     try:
         font = ImageFont.load_default()
@@ -145,37 +163,70 @@ def verify_conversion(input_dir, output_dir, expected_format):
     
     return success
 
+def fast_rmtree(path):
+    """
+    Remove a directory tree with os.scandir.
+
+    shutil.rmtree lstats every entry before deciding how to remove it; the
+    DirEntry type flag already says dir-or-not, so this skips one syscall
+    per entry. Returns True if the tree existed and was removed.
+    """
+    try:
+        entries = os.scandir(path)
+    except FileNotFoundError:
+        return False
+    with entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                fast_rmtree(entry.path)
+            else:
+                os.unlink(entry.path)
+    os.rmdir(path)
+    return True
+
+def convert_test_format(test_dir, output_format):
+    """Convert the test directory to one output format (process-pool worker)."""
+    # Each worker builds its own converter, so nothing needs to pickle
+    # beyond the two path/format strings.
+    converter = WebPConverter()
+    output_dir = f"test_output_{output_format}"
+    return converter.convert_directory(test_dir, output_dir, quality=80, output_format=output_format)
+
 def test_conversion():
     """Test the image conversion functionality."""
     print("Testing Image Converter...")
-    
+
     # Create test directory
     test_dir, test_files = create_test_directory()
-    
+
     # Initialize converter
     converter = WebPConverter()
-    
+
     # Test different output formats
     test_formats = ['webp', 'png', 'jpg', 'bmp']
-    
-    for output_format in test_formats:
+
+    # The four directory conversions are independent and CPU-bound in the
+    # encoders, so run them in separate processes; verification stays
+    # serial below to keep the output readable.
+    print(f"\nConverting {len(test_files)} images to "
+          f"{', '.join(f.upper() for f in test_formats)} in parallel...")
+    with ProcessPoolExecutor(max_workers=len(test_formats)) as executor:
+        all_stats = list(executor.map(
+            convert_test_format, repeat(test_dir), test_formats))
+
+    for output_format, stats in zip(test_formats, all_stats):
         print(f"\n{'='*50}")
         print(f"Testing conversion to {output_format.upper()}")
         print(f"{'='*50}")
-        
-        # Create output directory for this format
+
         output_dir = f"test_output_{output_format}"
-        
-        # Test directory conversion
-        print(f"Converting {len(test_files)} images to {output_format.upper()}...")
-        stats = converter.convert_directory(test_dir, output_dir, quality=80, output_format=output_format)
-        
+
         # Print conversion statistics
         print(f"  Total files: {stats['total_files']}")
         print(f"  Converted: {stats['converted']}")
         print(f"  Failed: {stats['failed']}")
         print(f"  Skipped: {stats['skipped']}")
-        
+
         # Verify conversion
         if stats['converted'] > 0:
             verify_conversion(test_dir, output_dir, output_format)
@@ -239,20 +290,20 @@ def test_conversion():
     # Add output directories
     for output_format in test_formats:
         output_dir = f"test_output_{output_format}"
-        if os.path.exists(output_dir):
-            shutil.rmtree(output_dir)
+        if fast_rmtree(output_dir):
             print(f"  Removed directory: {output_dir}")
-    
+
     # Remove test input directory
-    if os.path.exists(test_dir):
-        shutil.rmtree(test_dir)
+    if fast_rmtree(test_dir):
         print(f"  Removed directory: {test_dir}")
-    
-    # Remove individual files
+
+    # Remove individual files (unlink directly instead of stat-then-remove)
     for file in cleanup_files:
-        if os.path.exists(file):
+        try:
             os.remove(file)
             print(f"  Removed: {file}")
+        except FileNotFoundError:
+            pass
     
     print("\n✓ All tests completed!")
 
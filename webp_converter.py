@@ -8,30 +8,59 @@ Supports both command-line and GUI interfaces.
 import os
 import sys
 import argparse
+import json
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from pathlib import Path
 from typing import List, Optional
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
 from PIL import Image
 import threading
+import queue
+
+
+# Per-process converter for the pool workers, built once on first task so
+# repeated tasks in the same worker don't re-create it.
+_worker_converter = None
+
+
+def _convert_one(task, quality, lossless, output_format, method):
+    """
+    Process-pool worker: convert one (input, output) path pair.
+
+    Top-level so it pickles; only the path strings and the shared settings
+    cross the process boundary.
+    """
+    global _worker_converter
+    if _worker_converter is None:
+        _worker_converter = WebPConverter()
+    input_file, output_file = task
+    return _worker_converter.convert_image(input_file, output_file, quality, lossless, output_format, method=method)
 
 
 class WebPConverter:
     """Main class for converting images between formats."""
     
     def __init__(self):
-        self.supported_formats = {
-            '.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.tif', 
+        self.supported_formats = frozenset({
+            '.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.tif',
             '.gif', '.ico', '.ppm', '.pgm', '.pbm', '.pnm', '.webp'
-        }
+        })
         self.format_map = {
             'jpg': 'JPEG', 'jpeg': 'JPEG', 'png': 'PNG', 'bmp': 'BMP',
             'tiff': 'TIFF', 'tif': 'TIFF', 'gif': 'GIF', 'ico': 'ICO',
             'ppm': 'PPM', 'pgm': 'PPM', 'pbm': 'PPM', 'pnm': 'PPM', 'webp': 'WEBP'
         }
+        # Per-output-directory cache of allocated filenames, so uniqueness
+        # checks are set lookups instead of stat calls. Reset per run by
+        # convert_directory.
+        self._used_names = {}
     
-    def convert_image(self, input_path: str, output_path: Optional[str] = None, 
-                     quality: int = 80, lossless: bool = False, output_format: Optional[str] = None) -> bool:
+    def convert_image(self, input_path: str, output_path: Optional[str] = None,
+                     quality: int = 80, lossless: bool = False, output_format: Optional[str] = None,
+                     max_dimension: Optional[int] = None, method: int = 4) -> bool:
         """
         Convert a single image to the specified format.
         Args:
@@ -40,18 +69,44 @@ class WebPConverter:
             quality: Quality for lossy formats (0-100)
             lossless: Whether to use lossless compression (WebP only)
             output_format: Desired output format (e.g., 'png', 'jpeg', 'webp')
+            max_dimension: Cap on the longest side; for JPEG inputs libjpeg
+                decodes at the nearest 1/2, 1/4 or 1/8 scale (optional)
+            method: libwebp effort level, 0 (fastest) to 6 (best
+                compression); default 4 matches libwebp's own default
         Returns:
             bool: True if conversion successful, False otherwise
         """
         try:
             with Image.open(input_path) as img:
+                # Ask libjpeg to decode straight into RGB (skips its YCbCr
+                # conversion pass); with max_dimension set it also applies
+                # DCT-domain downscaling before the full decode.
+                if img.format == 'JPEG':
+                    if max_dimension is not None:
+                        img.draft('RGB', (max_dimension, max_dimension))
+                    else:
+                        img.draft('RGB', img.size)
                 # Convert to RGB if necessary for most formats
-                if img.mode in ('RGBA', 'LA', 'P'):
-                    background = Image.new('RGB', img.size, (255, 255, 255))
-                    if img.mode == 'P':
-                        img = img.convert('RGBA')
-                    background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
-                    img = background
+                if img.mode == 'P':
+                    # Palette without transparency goes straight to RGB;
+                    # otherwise fall through to the alpha handling below.
+                    img = img.convert('RGBA' if 'transparency' in img.info else 'RGB')
+                if img.mode in ('RGBA', 'LA'):
+                    alpha = img.getchannel('A')
+                    if alpha.getextrema()[0] == 255:
+                        # Fully opaque: getextrema is one C pass, which is
+                        # much cheaper than allocating and blending a
+                        # white background nobody would see.
+                        img = img.convert('RGB')
+                    else:
+                        # alpha_composite is a single vectorized blend
+                        # (SIMD-accelerated under pillow-simd), one fewer
+                        # intermediate buffer than the paste-with-mask route.
+                        white = Image.new('RGBA', img.size, (255, 255, 255, 255))
+                        img = Image.alpha_composite(
+                            white,
+                            img if img.mode == 'RGBA' else img.convert('RGBA')
+                        ).convert('RGB')
                 elif img.mode != 'RGB':
                     img = img.convert('RGB')
                 # Determine output format
@@ -70,46 +125,62 @@ class WebPConverter:
                 # Save with appropriate options
                 save_kwargs = {'format': output_format}
                 if output_format == 'WEBP':
+                    save_kwargs['method'] = method
                     if lossless:
                         save_kwargs['lossless'] = True
+                        # In lossless mode libwebp reads quality as the
+                        # effort/size tradeoff, not as a fidelity knob
+                        save_kwargs['quality'] = quality
                     else:
                         save_kwargs['quality'] = quality
                 elif output_format in ('JPEG', 'JPG'):
                     save_kwargs['quality'] = quality
-                img.save(output_path, **save_kwargs)
+                # Write to a sibling temp file and rename into place:
+                # os.replace is one atomic rename syscall, so an
+                # interrupted run never leaves a truncated output behind.
+                # save_kwargs always carries an explicit format, so the
+                # .part suffix doesn't confuse Pillow; the pid keeps pool
+                # workers writing into shared directories from colliding.
+                tmp_path = f"{output_path}.part.{os.getpid()}"
+                try:
+                    img.save(tmp_path, **save_kwargs)
+                    os.replace(tmp_path, output_path)
+                except BaseException:
+                    try:
+                        os.unlink(tmp_path)
+                    except FileNotFoundError:
+                        pass
+                    raise
                 return True
         except Exception as e:
             print(f"Error converting {input_path}: {e}")
             return False
     
     def convert_directory(self, input_dir: str, output_dir: Optional[str] = None,
-                         quality: int = 80, lossless: bool = False, output_format: Optional[str] = None, skip_node_modules: Optional[bool] = None) -> dict:
+                         quality: int = 80, lossless: bool = False, output_format: Optional[str] = None, skip_node_modules: Optional[bool] = None,
+                         method: int = 4, progress_callback=None) -> dict:
         """
         Recursively convert all supported images in a directory (and subdirectories) to the specified format.
+
+        progress_callback, if given, receives each per-file status line as
+        it happens (the GUI passes its thread-safe log here); by default
+        the lines go to stdout.
         """
+        report = progress_callback or print
         input_path = Path(input_dir)
         if output_dir is None:
             output_path = input_path.parent / f"{input_path.name}_{output_format or 'converted'}"
         else:
             output_path = Path(output_dir)
         
-        # Detect node_modules folders
-        node_modules_found = []
-        for root, dirs, files in os.walk(input_path):
-            if 'node_modules' in dirs:
-                node_modules_found.append(str(Path(root) / 'node_modules'))
-        
-        # If node_modules found and not already handled, ask user in CLI
-        if node_modules_found and skip_node_modules is None:
-            print("\n⚠️  Warning: 'node_modules' folder(s) found:")
-            for nm in node_modules_found:
-                print(f"   {nm}")
-            resp = input("\nDo you want to skip 'node_modules' and proceed with conversion? (y/n): ").strip().lower()
-            if resp != 'y':
-                print("Aborting conversion.")
-                sys.exit(1)
-            skip_node_modules = True
-        
+        # Fresh name cache for this run; the output tree may have changed
+        # between calls.
+        self._used_names = {}
+
+        # node_modules detection is fused into the conversion walk below:
+        # the prompt fires on the first hit instead of costing a separate
+        # full pre-scan of the tree.
+
         # Enhanced statistics
         stats = {
             'total_files': 0,
@@ -117,73 +188,145 @@ class WebPConverter:
             'failed': 0,
             'skipped': 0,
             'skipped_large': 0,
-            'format_counts': {},  # Count per format
+            'format_counts': Counter(),  # Count per format seen
             'webp_found': 0,      # WebP files already in input
             'total_output_files': 0  # Total files in output folder
         }
-        
-        # Initialize format counts
-        for fmt in self.supported_formats:
-            stats['format_counts'][fmt] = 0
-        
+
+
         MAX_IMAGE_SIZE = 50 * 1024 * 1024  # 50MB
-        
-        for root, dirs, files in os.walk(input_path):
-            # Skip node_modules if requested
-            if skip_node_modules and 'node_modules' in dirs:
-                dirs.remove('node_modules')
-            rel_dir = os.path.relpath(root, input_path)
+
+        # Cache of past conversions, kept beside the outputs: maps relative
+        # input path to the (mtime_ns, size, quality, lossless, method)
+        # signature it was last encoded with. A matching signature whose
+        # output still exists means libwebp can be skipped on re-runs.
+        cache_path = output_path / '.webp_cache.json'
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            cache = {}
+
+        # Collect conversion tasks during the walk; the encoding itself runs
+        # after, fanned out across processes. os.scandir yields DirEntry
+        # objects whose type and stat results are cached, so each file costs
+        # one syscall instead of the stat-per-Path of os.walk + Path.stat().
+        output_suffix = f'.{output_format.lower()}' if output_format else '.webp'
+        tasks = []
+        task_sigs = []  # (rel_file, signature) aligned with tasks
+        stack = [(str(input_path), '.')]
+        while stack:
+            current, rel_dir = stack.pop()
             out_dir = output_path / rel_dir if rel_dir != '.' else output_path
             out_dir.mkdir(parents=True, exist_ok=True)
-            for file in files:
-                file_path = Path(root) / file
-                if file_path.suffix.lower() in self.supported_formats:
-                    stats['total_files'] += 1
-                    
-                    # Count by format
-                    suffix = file_path.suffix.lower()
-                    stats['format_counts'][suffix] += 1
-                    
-                    # Skip if already in output format
-                    if output_format and suffix == f'.{output_format.lower()}':
-                        stats['skipped'] += 1
+            try:
+                entries = os.scandir(current)
+            except OSError:
+                continue
+            with entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name == 'node_modules':
+                            # Ask on first encounter in CLI mode; the answer
+                            # covers the rest of the walk
+                            if skip_node_modules is None:
+                                print("\n⚠️  Warning: 'node_modules' folder found:")
+                                print(f"   {entry.path}")
+                                resp = input("\nDo you want to skip 'node_modules' and proceed with conversion? (y/n): ").strip().lower()
+                                if resp != 'y':
+                                    print("Aborting conversion.")
+                                    sys.exit(1)
+                                skip_node_modules = True
+                            if skip_node_modules:
+                                continue
+                        stack.append((entry.path,
+                                      entry.name if rel_dir == '.'
+                                      else os.path.join(rel_dir, entry.name)))
                         continue
-                    
-                    # Check image size
-                    try:
-                        size = file_path.stat().st_size
-                    except Exception as e:
-                        print(f"✗ Failed to get size for {file_path}: {e}")
-                        stats['failed'] += 1
-                        continue
-                    if size > MAX_IMAGE_SIZE:
-                        print(f"⚠️  Skipping {file_path} (size {size / (1024*1024):.2f} MB > 50MB)")
-                        stats['skipped_large'] += 1
-                        continue
-                    
-                    # Generate unique output filename
-                    base_output_path = out_dir / file_path.stem
-                    output_file = base_output_path.with_suffix(f'.{output_format.lower()}')
-                    
-                    if self.convert_image(str(file_path), str(output_file), quality, lossless, output_format):
+
+                    name = entry.name
+                    dot = name.rfind('.')
+                    suffix = name[dot:].lower() if dot != -1 else ''
+                    if suffix in self.supported_formats:
+                        # Size gate first: oversized files are dropped
+                        # before any counting or classification work
+                        try:
+                            st = entry.stat()
+                        except Exception as e:
+                            report(f"✗ Failed to get size for {entry.path}: {e}")
+                            stats['failed'] += 1
+                            continue
+                        size = st.st_size
+                        if size > MAX_IMAGE_SIZE:
+                            report(f"⚠️  Skipping {entry.path} (size {size / (1024*1024):.2f} MB > 50MB)")
+                            stats['skipped_large'] += 1
+                            continue
+
+                        stats['total_files'] += 1
+
+                        # Count by format
+                        stats['format_counts'][suffix] += 1
+
+                        # Skip if already in output format
+                        if output_format and suffix == output_suffix:
+                            stats['skipped'] += 1
+                            continue
+
+                        output_file = out_dir / f"{name[:dot]}{output_suffix}"
+                        rel_file = name if rel_dir == '.' else os.path.join(rel_dir, name)
+                        sig = [st.st_mtime_ns, size, quality, lossless, method]
+                        if cache.get(rel_file) == sig and output_file.exists():
+                            # Unchanged since last run with the same
+                            # settings; the existing output stands and
+                            # counts toward the output tally just like a
+                            # freshly written file.
+                            stats['converted'] += 1
+                            stats['total_output_files'] += 1
+                            continue
+                        tasks.append((entry.path, str(output_file)))
+                        task_sigs.append((rel_file, sig))
+
+        # Encoding is CPU-bound inside libwebp/libjpeg, so a process pool
+        # scales it with core count. Small batches convert inline to skip
+        # the worker spawn cost.
+        if len(tasks) > 4:
+            with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+                results = executor.map(
+                    _convert_one, tasks,
+                    repeat(quality), repeat(lossless), repeat(output_format),
+                    repeat(method), chunksize=8)
+                for (in_file, out_file), (rel_file, sig), success in zip(tasks, task_sigs, results):
+                    if success:
                         stats['converted'] += 1
-                        print(f"✓ Converted: {file_path} -> {output_file}")
+                        # Running tally of files this run wrote, replacing
+                        # the re-walk of the output tree at the end
+                        stats['total_output_files'] += 1
+                        cache[rel_file] = sig
+                        report(f"✓ Converted: {in_file} -> {out_file}")
                     else:
                         stats['failed'] += 1
-                        print(f"✗ Failed: {file_path}")
-        
-        # Count total files in output folder
-        stats['total_output_files'] = self._count_output_files(output_path)
-        
+                        report(f"✗ Failed: {in_file}")
+        else:
+            for (in_file, out_file), (rel_file, sig) in zip(tasks, task_sigs):
+                if self.convert_image(in_file, out_file, quality, lossless, output_format, method=method):
+                    stats['converted'] += 1
+                    stats['total_output_files'] += 1
+                    cache[rel_file] = sig
+                    report(f"✓ Converted: {in_file} -> {out_file}")
+                else:
+                    stats['failed'] += 1
+                    report(f"✗ Failed: {in_file}")
+
+        # Best-effort write-back; a failed dump just means no skips next run
+        if cache:
+            try:
+                with open(cache_path, 'w', encoding='utf-8') as f:
+                    json.dump(cache, f)
+            except OSError:
+                pass
+
         return stats
-    
-    def _count_output_files(self, output_path: Path) -> int:
-        """Count total files in the output directory recursively."""
-        count = 0
-        for root, dirs, files in os.walk(output_path):
-            count += len(files)
-        return count
-    
+
     def print_conversion_summary(self, stats: dict, input_dir: str, output_dir: str):
         """
         Print a detailed conversion summary.
@@ -204,16 +347,16 @@ class WebPConverter:
         if stats['webp_found'] > 0:
             print(f"   WebP files found (already in WebP format): {stats['webp_found']}")
         
-        # Format breakdown
+        # Format breakdown, most frequent first; the Counter only holds
+        # formats that were actually seen
         print(f"\n📋 FORMAT BREAKDOWN:")
         total_convertible = 0
-        for fmt, count in sorted(stats['format_counts'].items()):
-            if count > 0:
-                if fmt == '.webp':
-                    print(f"   {fmt.upper()}: {count} (skipped - already WebP)")
-                else:
-                    print(f"   {fmt.upper()}: {count}")
-                    total_convertible += count
+        for fmt, count in stats['format_counts'].most_common():
+            if fmt == '.webp':
+                print(f"   {fmt.upper()}: {count} (skipped - already WebP)")
+            else:
+                print(f"   {fmt.upper()}: {count}")
+                total_convertible += count
         
         # Conversion results
         print(f"\n🔄 CONVERSION RESULTS:")
@@ -254,24 +397,36 @@ class WebPConverter:
         Returns:
             Path: Unique filename for the output WebP file
         """
+        # Uniqueness is resolved against a cached name set per directory:
+        # one listdir on first use instead of one stat per exists() probe.
+        out_dir = base_path.parent
+        used = self._used_names.get(out_dir)
+        if used is None:
+            try:
+                used = set(os.listdir(out_dir))
+            except FileNotFoundError:
+                used = set()
+            self._used_names[out_dir] = used
+
         # First try the simple name
-        output_path = base_path.with_suffix('.webp')
-        
-        # If it doesn't exist, we can use it
-        if not output_path.exists():
-            return output_path
-        
+        name = f"{base_path.stem}.webp"
+
+        if name not in used:
+            used.add(name)
+            return out_dir / name
+
         # If it exists, try with original extension suffix
         stem_with_ext = f"{base_path.stem}_{original_extension[1:]}"  # Remove the dot
-        output_path = base_path.parent / f"{stem_with_ext}.webp"
-        
+        name = f"{stem_with_ext}.webp"
+
         # If that also exists, add a number
         counter = 1
-        while output_path.exists():
-            output_path = base_path.parent / f"{stem_with_ext}_{counter}.webp"
+        while name in used:
+            name = f"{stem_with_ext}_{counter}.webp"
             counter += 1
-        
-        return output_path
+
+        used.add(name)
+        return out_dir / name
 
 
 class WebPConverterGUI:
@@ -283,8 +438,13 @@ class WebPConverterGUI:
         self.root.title("WebP Image Converter")
         self.root.geometry("600x500")
         self.root.resizable(True, True)
-        
+
         self.setup_ui()
+
+        # Log lines from the worker thread go through a queue; only the Tk
+        # main loop touches the Text widget, via the periodic drain below.
+        self._log_queue = queue.Queue()
+        self.root.after(100, self._drain_log)
     
     def setup_ui(self):
         """Setup the GUI interface."""
@@ -333,8 +493,16 @@ class WebPConverterGUI:
         
         # Lossless option
         self.lossless_var = tk.BooleanVar()
-        ttk.Checkbutton(quality_frame, text="Lossless compression", 
+        ttk.Checkbutton(quality_frame, text="Lossless compression",
                        variable=self.lossless_var).grid(row=1, column=0, columnspan=3, pady=(10, 0))
+
+        # WebP encoder effort (libwebp method: 0=fastest, 6=best compression)
+        ttk.Label(quality_frame, text="Effort:").grid(row=2, column=0, sticky=tk.W, pady=(10, 0))
+        self.method_var = tk.IntVar(value=4)
+        method_spin = ttk.Spinbox(quality_frame, from_=0, to=6, width=5,
+                                 textvariable=self.method_var)
+        method_spin.grid(row=2, column=1, sticky=tk.W, padx=(5, 5), pady=(10, 0))
+        ttk.Label(quality_frame, text="(0=fastest, 6=smallest)").grid(row=2, column=2, pady=(10, 0))
         
         # Convert button
         self.convert_btn = ttk.Button(main_frame, text="Convert", command=self.start_conversion)
@@ -392,10 +560,21 @@ class WebPConverterGUI:
             self.output_var.set(path)
     
     def log_message(self, message):
-        """Add message to log area."""
-        self.log_text.insert(tk.END, message + "\n")
-        self.log_text.see(tk.END)
-        self.root.update_idletasks()
+        """Queue a message for the log area (safe from any thread)."""
+        self._log_queue.put(message)
+
+    def _drain_log(self):
+        """Flush queued log lines into the Text widget in one insert."""
+        msgs = []
+        try:
+            while True:
+                msgs.append(self._log_queue.get_nowait())
+        except queue.Empty:
+            pass
+        if msgs:
+            self.log_text.insert(tk.END, "\n".join(msgs) + "\n")
+            self.log_text.see(tk.END)
+        self.root.after(100, self._drain_log)
     
     def start_conversion(self):
         """Start the conversion process in a separate thread."""
@@ -403,6 +582,7 @@ class WebPConverterGUI:
         output_path = self.output_var.get().strip()
         quality = self.quality_var.get()
         lossless = self.lossless_var.get()
+        method = self.method_var.get()
         output_format = self.output_var.get().strip().lower().lstrip('.') # Get output format from output path
         
         if not input_path:
@@ -419,12 +599,12 @@ class WebPConverterGUI:
         self.log_text.delete(1.0, tk.END)
         
         # Start conversion in separate thread
-        thread = threading.Thread(target=self.convert_thread, 
-                                args=(input_path, output_path, quality, lossless, output_format))
+        thread = threading.Thread(target=self.convert_thread,
+                                args=(input_path, output_path, quality, lossless, output_format, method))
         thread.daemon = True
         thread.start()
     
-    def convert_thread(self, input_path, output_path, quality, lossless, output_format):
+    def convert_thread(self, input_path, output_path, quality, lossless, output_format, method=4):
         """Conversion thread to avoid blocking the GUI."""
         try:
             input_path_obj = Path(input_path)
@@ -441,7 +621,7 @@ class WebPConverterGUI:
                     print(f"Error: The image '{input_path}' is too large ({file_size / (1024*1024):.2f} MB). Please use an image under 50MB.")
                     sys.exit(1)
                 print(f"Converting: {input_path}")
-                success = self.converter.convert_image(input_path, output_path, quality, lossless, output_format)
+                success = self.converter.convert_image(input_path, output_path, quality, lossless, output_format, method=method)
                 if success:
                     print("✓ Conversion completed successfully!")
                 else:
@@ -450,7 +630,8 @@ class WebPConverterGUI:
             else:
                 # Directory conversion
                 self.log_message(f"Converting directory: {input_path}")
-                stats = self.converter.convert_directory(input_path, output_path, quality, lossless, output_format)
+                stats = self.converter.convert_directory(input_path, output_path, quality, lossless, output_format, method=method,
+                                                         progress_callback=self.log_message)
                 
                 self.log_message(f"\nConversion Summary:")
                 self.log_message(f"Total files: {stats['total_files']}")
@@ -498,8 +679,11 @@ Examples:
     parser.add_argument('-o', '--output', help='Output file or directory')
     parser.add_argument('-q', '--quality', type=int, default=80, 
                        help='WebP quality (0-100, default: 80)')
-    parser.add_argument('--lossless', action='store_true', 
+    parser.add_argument('--lossless', action='store_true',
                        help='Use lossless compression')
+    parser.add_argument('--method', type=int, default=4, choices=range(7),
+                       metavar='0-6',
+                       help='WebP encoder effort, 0=fastest to 6=best compression (default: 4)')
     parser.add_argument('--gui', action='store_true', 
                        help='Start GUI interface')
     parser.add_argument('--formats', action='store_true', 
@@ -557,7 +741,7 @@ Examples:
             print(f"Error: The image '{input_path}' is too large ({file_size / (1024*1024):.2f} MB). Please use an image under 50MB.")
             sys.exit(1)
         print(f"Converting: {input_path}")
-        success = converter.convert_image(input_path, output_path, quality, lossless, output_format)
+        success = converter.convert_image(input_path, output_path, quality, lossless, output_format, method=args.method)
         if success:
             print("✓ Conversion completed successfully!")
         else:
@@ -566,7 +750,7 @@ Examples:
     else:
         # Directory conversion
         print(f"Converting directory: {input_path}")
-        stats = converter.convert_directory(input_path, output_path, quality, lossless, output_format)
+        stats = converter.convert_directory(input_path, output_path, quality, lossless, output_format, method=args.method)
         
         # Print detailed summary
         converter.print_conversion_summary(stats, input_path, output_path or str(Path(input_path).parent / f"{Path(input_path).name}_{output_format}"))